@@ -1 +1,411 @@
-
+import streamlit as st
+import gspread
+from concurrent.futures import ThreadPoolExecutor, wait
+from google.oauth2.service_account import Credentials
+from google.auth.exceptions import GoogleAuthError, TransportError
+import pandas as pd
+from datetime import datetime
+import json
+from pathlib import Path
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- CONFIGURATION ---
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SHEET_NAME = "Missionary_Tracker"  # Make sure this matches your Google Sheet Name
+# Columns the app reads, which must sit inside DATA_RANGE (the flags in E:G, where
+# the checkboxes write). Anything to the right is never downloaded.
+REQUIRED_COLUMNS = ["Name", "Last_Session_Date", "Report_Day"]
+FLAG_COLUMNS = ["P1_Sent_Encouragement", "P2_Received_Report", "P3_Sent_Prework"]
+OPTIONAL_COLUMNS = ["Chat_Link", "Webhook_Url"]  # Left blank if the sheet doesn't have them
+DATA_RANGE = "A:H"
+RETRY_ATTEMPTS = 8  # Tries per Sheets API call before giving up (quotas reset every minute)
+# Last good copy of the sheet, shown if Google Sheets can't be reached
+SNAPSHOT_PATH = Path(__file__).parent / ".cache" / "missionaries.json"
+SESSION_INTERVAL = pd.Timedelta(days=7)  # Sessions are weekly
+# How a ticked checkbox can come back from the sheet; anything else (FALSE, blank) is unticked
+TRUE_VALUES = {"TRUE", "True", "true"}
+CARDS_PER_PAGE = 20  # Longer rosters are split into pages
+WRITE_WAIT_SECONDS = 5  # How long a full rerun waits for background saves before reading the sheet
+
+# --- API RETRIES ---
+# What a call to Google can fail with: API errors, network failures and credential errors
+SHEETS_ERRORS = (gspread.exceptions.APIError, requests.exceptions.RequestException, GoogleAuthError)
+
+def is_retryable(e):
+    """True for errors that may go away on their own: rate limits (429), server errors (5xx), network failures."""
+    if isinstance(e, gspread.exceptions.APIError):
+        status = e.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(e, (requests.exceptions.RequestException, TransportError))
+
+def with_retry(fn, *args, **kwargs):
+    """Calls a gspread method, backing off on rate limits (429) and server errors (5xx)."""
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if attempt == RETRY_ATTEMPTS - 1 or not is_retryable(e):
+                raise
+            # Wait as long as Google asks (Retry-After), otherwise back off exponentially
+            # (1s, 2s, 4s, ...) plus up to 1s of random jitter; never more than 32s
+            retry_after = e.response.headers.get("Retry-After", "")
+            delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt + random.random()
+            time.sleep(min(delay, 32))
+
+# --- AUTHENTICATION ---
+# Uses Streamlit Secrets for security (explained in Phase 3)
+@st.cache_resource(ttl=3600)
+def get_google_sheet_client():
+    creds_dict = dict(st.secrets["gcp_service_account"])
+    creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPE)
+    client = gspread.authorize(creds)
+    return client
+
+@st.cache_resource(ttl=3600)
+def get_sheet():
+    client = get_google_sheet_client()
+    # Opening by key (the ID in the sheet's URL) skips the Drive search by name
+    sheet_key = st.secrets.get("sheet_key")
+    if sheet_key:
+        return with_retry(client.open_by_key, sheet_key).sheet1
+    return with_retry(client.open, SHEET_NAME).sheet1
+
+# --- DATA ---
+# Cached so reruns (e.g. checkbox clicks) don't re-download the whole sheet.
+# Our own writes clear it; the Refresh button picks up edits made in the sheet itself.
+# The leading underscore tells Streamlit not to hash the worksheet object.
+@st.cache_data(ttl=300)
+def load_records(_sheet):
+    values = with_retry(_sheet.get, DATA_RANGE, pad_values=True)
+    df = build_frame(values)
+    # Only after build_frame() accepted it, so a broken sheet never replaces the last good copy
+    save_snapshot(values)
+    return df
+
+def build_frame(values):
+    """Turns raw sheet values (header row first) into the tracker DataFrame.
+
+    Raises ValueError if the header row is missing any of REQUIRED_COLUMNS or
+    doesn't have FLAG_COLUMNS in E:G. Missing OPTIONAL_COLUMNS come back blank
+    and are listed in df.attrs['missing_columns'].
+    """
+    # An empty sheet comes back as [[]] (no header cells), not []
+    if not values or not any(values[0]):
+        return pd.DataFrame()
+    missing = [column for column in REQUIRED_COLUMNS if column not in values[0]]
+    if missing:
+        raise ValueError(f"The sheet has no {', '.join(missing)} column in {DATA_RANGE}.")
+    # The checkboxes write to E:G, so the flags must be exactly there
+    if values[0][4:7] != FLAG_COLUMNS:
+        raise ValueError(f"Columns E:G must be {', '.join(FLAG_COLUMNS)}, in that order.")
+    # Row 1 holds the headers
+    df = pd.DataFrame(values[1:], columns=values[0])
+    df.attrs['missing_columns'] = [column for column in OPTIONAL_COLUMNS if column not in df]
+    for column in df.attrs['missing_columns']:
+        df[column] = ""
+    # Remember each record's sheet row (Row 1 is headers), so writes don't depend on display order
+    df['sheet_row'] = range(2, len(df) + 2)
+    # Decode the TRUE/FALSE flags and parse dates here, once per load, instead of on every rerun
+    df['p1'] = df['P1_Sent_Encouragement'].isin(TRUE_VALUES)
+    df['p2'] = df['P2_Received_Report'].isin(TRUE_VALUES)
+    df['p3'] = df['P3_Sent_Prework'].isin(TRUE_VALUES)
+    # Only a handful of distinct days, so store them as codes rather than one string per row
+    df['Report_Day'] = df['Report_Day'].astype('category')
+    # Bad dates become NaT
+    df['last_session'] = pd.to_datetime(df['Last_Session_Date'].astype(str), format="%Y-%m-%d", errors="coerce")
+    # Determine "Next Session"
+    df['next_session'] = df['last_session'] + SESSION_INTERVAL
+    return df
+
+def save_snapshot(values):
+    """Saves the raw sheet values to disk for load_snapshot()."""
+    # Write to a temp file and swap it in, so a reader never sees half a file
+    try:
+        SNAPSHOT_PATH.parent.mkdir(exist_ok=True)
+        tmp_path = SNAPSHOT_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(values))
+        tmp_path.replace(SNAPSHOT_PATH)
+    except OSError:
+        pass  # The snapshot is only a fallback; never fail a load over it
+
+def load_snapshot():
+    """Returns the sheet values saved by the last successful load, or None."""
+    try:
+        return json.loads(SNAPSHOT_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+
+# --- HELPER FUNCTIONS ---
+def sync_checkbox(key, loaded):
+    """Sets a checkbox to the sheet's value when that value changed since the last load.
+
+    A keyed checkbox otherwise keeps this session's state and ignores fresh data,
+    so Refresh wouldn't pick up ticks changed in the sheet itself.
+    """
+    last_loaded = st.session_state.setdefault("loaded_flags", {})
+    if key not in st.session_state or last_loaded.get(key) != loaded:
+        st.session_state[key] = loaded
+    last_loaded[key] = loaded
+
+def reset_checkboxes(cells):
+    """Puts the checkboxes for writes the sheet refused back to the sheet's value."""
+    cell_keys = st.session_state.get("cell_keys", {})
+    last_loaded = st.session_state.get("loaded_flags", {})
+    for cell in cells:
+        # Forgetting the last loaded value makes sync_checkbox() reapply it on the next render
+        last_loaded.pop(cell_keys.get(cell), None)
+
+def queue_write(cell, key):
+    """Buffers a checkbox's new value until the next flush_writes()."""
+    # Keyed by cell, so a box toggled more than once before a flush is written once
+    st.session_state.setdefault("pending_writes", {})[cell] = "TRUE" if st.session_state[key] else "FALSE"
+    st.session_state.setdefault("cell_keys", {})[cell] = key
+
+def write_cells(sheet, writes):
+    """Sends {cell: value} writes to the sheet in one batch request."""
+    data = [{"range": cell, "values": [[value]]} for cell, value in writes.items()]
+    with_retry(sheet.batch_update, data, value_input_option="USER_ENTERED")
+    load_records.clear()
+
+def flush_writes(sheet):
+    """Sends all buffered cell writes to the sheet, waiting for the result.
+
+    If that fails the writes stay queued, unless retrying can't help (see
+    is_retryable), in which case they are dropped so they don't fail every run.
+    """
+    pending = st.session_state.get("pending_writes")
+    if pending:
+        st.session_state.pending_writes = {}
+        try:
+            write_cells(sheet, pending)
+        except Exception as e:
+            if is_retryable(e):
+                st.session_state.pending_writes = pending
+            else:
+                reset_checkboxes(pending)
+            raise
+
+def describe_write_error(e):
+    """The warning shown when checkbox changes couldn't be saved."""
+    if is_retryable(e):
+        return f"Couldn't save to Google Sheets yet; it will be retried. Error: {e}"
+    return f"Google Sheets refused a checkbox change, so it wasn't saved. Error: {e}"
+
+def get_write_executor():
+    """Returns this session's background writer.
+
+    One worker, so the session's writes reach the sheet in the order they were made.
+    Kept per session, so one user's backoff never holds up anyone else's saves.
+    """
+    if "write_executor" not in st.session_state:
+        st.session_state.write_executor = ThreadPoolExecutor(max_workers=1)
+    return st.session_state.write_executor
+
+def save_checkbox(cell, key):
+    """Checkbox callback: queues the new value and sends it to the sheet in the background.
+
+    A click inside a card only reruns that card's fragment, so the write can't wait
+    for main() to flush it, and the card shouldn't wait on Google either.
+    collect_writes() picks up the result.
+    """
+    queue_write(cell, key)
+    writes = st.session_state.pending_writes
+    st.session_state.pending_writes = {}
+    try:
+        future = get_write_executor().submit(write_cells, get_sheet(), writes)
+    except SHEETS_ERRORS as e:
+        if is_retryable(e):
+            st.session_state.pending_writes = writes
+        else:
+            reset_checkboxes(writes)
+        st.session_state.write_error = e
+        return
+    st.session_state.setdefault("background_writes", []).append((future, writes))
+
+def collect_writes(block=False):
+    """Checks on background writes, putting any that failed back in the queue.
+
+    A failed value isn't requeued if retrying can't fix the error, or if a later
+    write to the same cell has been made since; in the first case its checkbox
+    goes back to the sheet's value. Returns the most recent error,
+    if any. With block=True it first waits up to WRITE_WAIT_SECONDS for writes
+    still in flight, so a following read is likely to see them; any still
+    running after that are left to finish and checked on a later call.
+    """
+    error = st.session_state.pop("write_error", None)
+    in_flight = st.session_state.get("background_writes", [])
+    if block and in_flight:
+        wait([future for future, _ in in_flight], timeout=WRITE_WAIT_SECONDS)
+    requeue, refused = {}, set()
+    # Writes finish in order, so stop at the first one that hasn't
+    while in_flight and in_flight[0][0].done():
+        future, writes = in_flight.pop(0)
+        failure = future.exception()
+        if failure:
+            error = failure
+        # This write replaces any earlier failed value for its cells
+        for cell in writes:
+            requeue.pop(cell, None)
+            refused.discard(cell)
+        if failure and is_retryable(failure):
+            requeue.update(writes)
+        elif failure:
+            refused.update(writes)
+    # So do writes still running, whichever way they turn out
+    for _, writes in in_flight:
+        for cell in writes:
+            requeue.pop(cell, None)
+            refused.discard(cell)
+    pending = st.session_state.setdefault("pending_writes", {})
+    for cell, value in requeue.items():
+        pending.setdefault(cell, value)  # Values queued since then are newer
+    reset_checkboxes(cell for cell in refused if cell not in pending)
+    return error
+
+# Cached so repeated nudges reuse the open connection instead of a new TLS handshake each time
+@st.cache_resource
+def get_webhook_session():
+    # Only retry replies that mean the message wasn't taken (429, 503). A timeout or other
+    # error may come after Google Chat already posted it, and retrying would post it twice.
+    retry = Retry(total=3, connect=0, read=0, other=0, backoff_factor=0.5, status_forcelist=[429, 503],
+                  allowed_methods=["POST"], raise_on_status=False)
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_maxsize=4, max_retries=retry))
+    return session
+
+def send_webhook_notification(webhook_url, message):
+    """Sends a message to Google Chat via Webhook."""
+    if not webhook_url or str(webhook_url).strip() == "":
+        st.warning("No Webhook URL found.")
+        return False
+        
+    headers = {'Content-Type': 'application/json; charset=UTF-8'}
+    data = {'text': message}
+    try:
+        response = get_webhook_session().post(webhook_url, json=data, headers=headers, timeout=5)
+        if response.status_code == 200:
+            return True
+        else:
+            st.error(f"Webhook failed: {response.text}")
+            return False
+    except Exception as e:
+        st.error(f"Error sending webhook: {e}")
+        return False
+
+# --- CARD UI ---
+# A fragment, so clicking inside one card reruns just that card instead of the whole page
+@st.fragment
+def render_card(i, row):
+    sheet_row_number = row['sheet_row']
+    name = row['Name']
+    last_session_str = row['Last_Session_Date']
+    report_day = row['Report_Day']
+    chat_link = row['Chat_Link']
+    # A1 cells for this row's P1-P3 columns (E:G)
+    cells = {'p1': f"E{sheet_row_number}", 'p2': f"F{sheet_row_number}", 'p3': f"G{sheet_row_number}"}
+    # Widget keys for the same three boxes
+    keys = {'p1': f"p1_{i}", 'p2': f"p2_{i}", 'p3': f"p3_{i}"}
+
+    write_error = collect_writes()
+    if write_error:
+        st.warning(describe_write_error(write_error))
+    for flag, key in keys.items():
+        sync_checkbox(key, bool(row[flag]))
+
+    with st.expander(f"**{name}** (Session: {last_session_str})", expanded=True):
+        
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.caption(f"Mid-Week Report Due: **{report_day}**")
+            
+            # POINT 1: Day After Encouragement
+            st.checkbox(f"Point 1: Sent Encouragement (Day +1)", key=keys['p1'],
+                        on_change=save_checkbox, args=(cells['p1'], keys['p1']))
+
+            # POINT 2: Mid-Week Report
+            p2_val = st.checkbox(f"Point 2: Received Report ({report_day})", key=keys['p2'],
+                                 on_change=save_checkbox, args=(cells['p2'], keys['p2']))
+
+            # POINT 3: Pre-Work Follow Up
+            label_p3 = "Point 3: Pre-Work Check (Due Soon)" if row['due_soon'] else "Point 3: Pre-Work Check"
+            st.checkbox(label_p3, key=keys['p3'],
+                        on_change=save_checkbox, args=(cells['p3'], keys['p3']))
+
+        with col2:
+            # Deep Link Button
+            if chat_link:
+                st.link_button("💬 Chat", chat_link)
+            
+            # Automation / Nudge Button
+            if not p2_val:
+                if st.button("🔔 Nudge", key=f"nudge_{i}", help="Send webhook reminder"):
+                    webhook_url = row['Webhook_Url']
+                    msg = f"Hi {name}, just a reminder to send in your report for this week!"
+                    success = send_webhook_notification(webhook_url, msg)
+                    if success:
+                        st.toast(f"Notification sent to {name}!")
+
+# --- MAIN APP ---
+def main():
+    st.set_page_config(page_title="Mentor Tracker", page_icon="🧭", layout="centered")
+    st.title("🧭 Missionary Mentor Tracker")
+    if st.button("🔄 Refresh", help="Reload the latest data from the Google Sheet"):
+        load_records.clear()
+
+    # 1. Load Data (saving any checkbox changes still queued from an earlier failure first)
+    # A write still running after the wait clears load_records again when it lands.
+    write_error = collect_writes(block=True)
+    # Retryable failures were requeued; flush_writes below retries them and warns if that fails
+    if write_error and not is_retryable(write_error):
+        st.warning(describe_write_error(write_error))
+    try:
+        sheet = get_sheet()
+        # A failed save shouldn't stop the load, or the page would be stuck on the snapshot
+        try:
+            flush_writes(sheet)
+        except SHEETS_ERRORS as e:
+            st.warning(describe_write_error(e))
+        df = load_records(sheet)
+    except ValueError as e:
+        st.error(f"The Google Sheet isn't laid out the way this app expects. {e}")
+        st.stop()
+    except SHEETS_ERRORS as e:
+        snapshot = load_snapshot()
+        if snapshot is None:
+            st.error(f"Could not connect to Google Sheet. Error: {e}")
+            st.stop()
+        st.warning(f"Could not reach Google Sheets, so this is the last saved copy. "
+                   f"Checkbox changes will be saved once the connection is back. Error: {e}")
+        df = build_frame(snapshot)
+
+    if df.empty:
+        st.info("No data found in the sheet.")
+        st.stop()
+    if df.attrs.get('missing_columns'):
+        st.warning(f"Optional column(s) missing from {DATA_RANGE}, so left blank: "
+                   f"{', '.join(df.attrs['missing_columns'])}.")
+
+    # 2. Work out each missionary's status for the whole sheet at once
+    today = pd.Timestamp(datetime.now().date())
+    df['date_ok'] = df['last_session'].notna()
+    df['due_soon'] = (df['next_session'] - today).dt.days <= 1
+
+    # 3. Iterate through Missionaries, one page at a time
+    st.markdown("---")
+    pages = -(-len(df) // CARDS_PER_PAGE)  # Round up
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    start = (page - 1) * CARDS_PER_PAGE
+    # i stays the position in the whole sheet, so widget keys don't change between pages
+    for i, row in enumerate(df.iloc[start:start + CARDS_PER_PAGE].to_dict("records"), start=start):
+        if not row['date_ok']:
+            st.error(f"Date format error for {row['Name']}. Use YYYY-MM-DD.")
+            continue
+        render_card(i, row)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
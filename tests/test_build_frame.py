@@ -0,0 +1,51 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app
+
+HEADER = ["Name", "Chat_Link", "Last_Session_Date", "Report_Day",
+          "P1_Sent_Encouragement", "P2_Received_Report", "P3_Sent_Prework", "Webhook_Url"]
+
+
+class BuildFrameTest(unittest.TestCase):
+    def test_empty_sheet_gives_empty_frame(self):
+        # gspread pads an empty range to [[]]
+        self.assertTrue(app.build_frame([[]]).empty)
+        self.assertTrue(app.build_frame([]).empty)
+
+    def test_header_only_sheet_gives_empty_frame(self):
+        df = app.build_frame([HEADER])
+        self.assertTrue(df.empty)
+        self.assertIn("p1", df.columns)
+
+    def test_missing_required_column_raises(self):
+        header = ["Missionary"] + HEADER[1:]
+        with self.assertRaisesRegex(ValueError, "Name"):
+            app.build_frame([header])
+
+    def test_flags_out_of_order_raise(self):
+        header = HEADER[:4] + [HEADER[5], HEADER[4], HEADER[6], HEADER[7]]
+        with self.assertRaisesRegex(ValueError, "E:G"):
+            app.build_frame([header])
+
+    def test_missing_optional_columns_are_blank(self):
+        header = HEADER[:7] + ["Notes"]
+        df = app.build_frame([header, ["Elder A", "", "2026-10-09", "Wednesday", "TRUE", "FALSE", "", "x"]])
+        self.assertEqual(df.attrs["missing_columns"], ["Webhook_Url"])
+        self.assertEqual(df.loc[0, "Webhook_Url"], "")
+
+    def test_rows_are_numbered_from_sheet_row_two(self):
+        rows = [["Elder A", "", "2026-10-09", "Wednesday", "TRUE", "FALSE", "", ""],
+                ["Sister B", "", "bad-date", "Friday", "false", "TRUE", "FALSE", ""]]
+        df = app.build_frame([HEADER] + rows)
+        self.assertEqual(list(df["sheet_row"]), [2, 3])
+        self.assertEqual(list(df["p1"]), [True, False])
+        self.assertEqual(list(df["p3"]), [False, False])
+        self.assertTrue(df["last_session"].isna()[1])
+        self.assertEqual(df.attrs["missing_columns"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+
+import gspread
+import requests
+import streamlit as st
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app
+
+
+def failed(error):
+    future = Future()
+    future.set_exception(error)
+    return future
+
+def api_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b'{"error": {"code": %d, "message": "error", "status": "ERROR"}}' % status
+    return gspread.exceptions.APIError(response)
+
+
+class CollectWritesTest(unittest.TestCase):
+    def setUp(self):
+        st.session_state.clear()
+
+    def test_failed_write_is_requeued(self):
+        st.session_state.background_writes = [(failed(requests.exceptions.ConnectionError("down")), {"E2": "TRUE"})]
+        self.assertIsNotNone(app.collect_writes())
+        self.assertEqual(st.session_state.pending_writes, {"E2": "TRUE"})
+
+    def test_failed_write_is_dropped_while_a_later_write_to_the_cell_is_running(self):
+        later = Future()
+        st.session_state.background_writes = [(failed(requests.exceptions.ConnectionError("down")), {"E2": "TRUE"}),
+                                              (later, {"E2": "FALSE"})]
+        app.collect_writes()
+        self.assertEqual(st.session_state.pending_writes, {})
+        # Once the later write lands, nothing is left to overwrite it
+        later.set_result(None)
+        app.collect_writes()
+        self.assertEqual(st.session_state.pending_writes, {})
+        self.assertEqual(st.session_state.background_writes, [])
+
+    def test_failed_write_is_dropped_after_a_later_failure_to_the_cell(self):
+        st.session_state.background_writes = [(failed(requests.exceptions.ConnectionError("down")), {"E2": "TRUE"}),
+                                              (failed(api_error(403)), {"E2": "FALSE"})]
+        app.collect_writes()
+        self.assertEqual(st.session_state.pending_writes, {})
+
+    def test_write_refused_by_sheets_is_not_requeued(self):
+        st.session_state.background_writes = [(failed(api_error(400)), {"E2": "TRUE"})]
+        self.assertIsNotNone(app.collect_writes())
+        self.assertEqual(st.session_state.pending_writes, {})
+
+    def test_refused_write_puts_its_checkbox_back(self):
+        st.session_state.update({"p1_0": True, "cell_keys": {"E2": "p1_0"}, "loaded_flags": {"p1_0": False}})
+        st.session_state.background_writes = [(failed(api_error(403)), {"E2": "TRUE"})]
+        error = app.collect_writes(block=True)
+        self.assertFalse(app.is_retryable(error))
+        self.assertEqual(st.session_state.pending_writes, {})
+        # The next render shows the sheet's value again
+        app.sync_checkbox("p1_0", False)
+        self.assertFalse(st.session_state["p1_0"])
+
+    def test_refused_write_leaves_a_checkbox_changed_since(self):
+        st.session_state.update({"p1_0": False, "cell_keys": {"E2": "p1_0"}, "loaded_flags": {"p1_0": False}})
+        st.session_state.background_writes = [(failed(api_error(403)), {"E2": "TRUE"}), (Future(), {"E2": "FALSE"})]
+        app.collect_writes()
+        self.assertEqual(st.session_state.loaded_flags, {"p1_0": False})
+
+    def test_block_gives_up_on_writes_still_running(self):
+        running = Future()
+        st.session_state.background_writes = [(running, {"E2": "TRUE"})]
+        with mock.patch.object(app, "WRITE_WAIT_SECONDS", 0.01):
+            self.assertIsNone(app.collect_writes(block=True))
+        self.assertEqual(st.session_state.background_writes, [(running, {"E2": "TRUE"})])
+
+
+if __name__ == "__main__":
+    unittest.main()